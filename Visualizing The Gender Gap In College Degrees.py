@@ -66,73 +66,15 @@ other_cats = ['Health Professions', 'Public Administration', 'Education', 'Agric
 # In[34]:
 
 
-fig = plt.figure(figsize=(16, 20))
+from gender_gap import GenderGapGrid, prepare_shares
 
-##Generate first column for STEM majors
-#Disable the x-axis labels for all line charts except the bottommost 
-#line charts in each column.
-for sp in range(0,18,3):
-    cat_index = int(sp/3)
-    ax = fig.add_subplot(6,3,sp+1)
-    ax.plot(women_degrees['Year'], women_degrees[stem_cats[cat_index]], c=cb_dark_blue, label='Women', linewidth=3)
-    ax.plot(women_degrees['Year'], 100-women_degrees[stem_cats[cat_index]], c=cb_orange, label='Men', linewidth=3)
-    for key,spine in ax.spines.items():
-        spine.set_visible(False)
-    ax.set_xlim(1968, 2011)
-    ax.set_ylim(0,100)
-    ax.set_title(stem_cats[cat_index])
-    ax.tick_params(bottom="off", top="off", left="off", right="off", labelbottom='off')
-    
-    if cat_index == 0:
-        ax.text(2003, 85, 'Women')
-        ax.text(2005, 10, 'Men')
-    elif cat_index == 5:
-        ax.text(2005, 87, 'Men')
-        ax.text(2003, 7, 'Women')
-        ax.tick_params(labelbottom='on')
-        
-# Generate second column of line charts. Liberal arts degrees.
-for sp in range(1,16,3):
-    cat_index = int((sp-1)/3)
-    ax = fig.add_subplot(6,3,sp+1)
-    ax.plot(women_degrees['Year'], women_degrees[lib_arts_cats[cat_index]], c=cb_dark_blue, label='Women', linewidth=3)
-    ax.plot(women_degrees['Year'], 100-women_degrees[lib_arts_cats[cat_index]], c=cb_orange, label='Men', linewidth=3)
-    for key,spine in ax.spines.items():
-        spine.set_visible(False)
-    ax.set_xlim(1968, 2011)
-    ax.set_ylim(0,100)
-    ax.set_title(lib_arts_cats[cat_index])
-    ax.tick_params(bottom="off", top="off", left="off", right="off", labelbottom='off')
-    
-    if cat_index == 0:
-        ax.text(2003, 78, 'Women')
-        ax.text(2005, 18, 'Men')
-    elif cat_index == 4:
-        ax.tick_params(labelbottom='on')
-
-## Generate third column of line charts. Other degrees.
-for sp in range(2,20,3):
-    cat_index = int((sp-2)/3)
-    ax = fig.add_subplot(6,3,sp+1)
-    ax.plot(women_degrees['Year'], women_degrees[other_cats[cat_index]], c=cb_dark_blue, label='Women', linewidth=3)
-    ax.plot(women_degrees['Year'], 100-women_degrees[other_cats[cat_index]], c=cb_orange, label='Men', linewidth=3)
-    for key,spine in ax.spines.items():
-        spine.set_visible(False)
-    ax.set_xlim(1968, 2011)
-    ax.set_ylim(0,100)
-    ax.set_title(other_cats[cat_index])
-    ax.tick_params(bottom="off", top="off", left="off", right="off", labelbottom='off')
-   
-    if cat_index == 0:
-        ax.text(2003, 90, 'Women')
-        ax.text(2005, 5, 'Men')
-    elif cat_index == 5:
-        ax.text(2005, 62, 'Men')
-        ax.text(2003, 30, 'Women')
-        ax.tick_params(labelbottom='on')
-        
+# Work out the women and men shares for all 17 degrees once, every plot reads from this.
+shares = prepare_shares(women_degrees)
 
-        
+# Build the 6x3 grid once: STEM majors in the first column, liberal arts in the second and
+# other degrees in the third. Women/Men annotations go on the topmost and bottommost plots,
+# and the x-axis labels are disabled for all line charts except the bottommost in each column.
+grid = GenderGapGrid(shares, groups=[stem_cats, lib_arts_cats, other_cats])
 plt.show()
 
 
@@ -141,75 +83,9 @@ plt.show()
 
 # For all plots:
 # Enable just the y-axis labels at 0 and 100.
-fig = plt.figure(figsize=(16, 20))
-
-##Generate first column for STEM majors
-for sp in range(0,18,3):
-    cat_index = int(sp/3)
-    ax = fig.add_subplot(6,3,sp+1)
-    ax.plot(women_degrees['Year'], women_degrees[stem_cats[cat_index]], c=cb_dark_blue, label='Women', linewidth=3)
-    ax.plot(women_degrees['Year'], 100-women_degrees[stem_cats[cat_index]], c=cb_orange, label='Men', linewidth=3)
-    for key,spine in ax.spines.items():
-        spine.set_visible(False)
-    ax.set_xlim(1968, 2011)
-    ax.set_ylim(0,100)
-    ax.set_yticks([0,100])
-    ax.set_title(stem_cats[cat_index])
-    ax.tick_params(bottom="off", top="off", left="off", right="off", labelbottom='off')
-    
-    if cat_index == 0:
-        ax.text(2003, 85, 'Women')
-        ax.text(2005, 10, 'Men')
-    elif cat_index == 5:
-        ax.text(2005, 87, 'Men')
-        ax.text(2003, 7, 'Women')
-        ax.tick_params(labelbottom='on')
-        
-# Generate second column of line charts. Liberal arts degrees.
-for sp in range(1,16,3):
-    cat_index = int((sp-1)/3)
-    ax = fig.add_subplot(6,3,sp+1)
-    ax.plot(women_degrees['Year'], women_degrees[lib_arts_cats[cat_index]], c=cb_dark_blue, label='Women', linewidth=3)
-    ax.plot(women_degrees['Year'], 100-women_degrees[lib_arts_cats[cat_index]], c=cb_orange, label='Men', linewidth=3)
-    for key,spine in ax.spines.items():
-        spine.set_visible(False)
-    ax.set_xlim(1968, 2011)
-    ax.set_ylim(0,100)
-    ax.set_yticks([0,100])
-    ax.set_title(lib_arts_cats[cat_index])
-    ax.tick_params(bottom="off", top="off", left="off", right="off", labelbottom='off')
-    
-    if cat_index == 0:
-        ax.text(2003, 78, 'Women')
-        ax.text(2005, 18, 'Men')
-    elif cat_index == 4:
-        ax.tick_params(labelbottom='on')
-
-## Generate third column of line charts. Other degrees.
-for sp in range(2,20,3):
-    cat_index = int((sp-2)/3)
-    ax = fig.add_subplot(6,3,sp+1)
-    ax.plot(women_degrees['Year'], women_degrees[other_cats[cat_index]], c=cb_dark_blue, label='Women', linewidth=3)
-    ax.plot(women_degrees['Year'], 100-women_degrees[other_cats[cat_index]], c=cb_orange, label='Men', linewidth=3)
-    for key,spine in ax.spines.items():
-        spine.set_visible(False)
-    ax.set_xlim(1968, 2011)
-    ax.set_ylim(0,100)
-    ax.set_yticks([0,100])
-    ax.set_title(other_cats[cat_index])
-    ax.tick_params(bottom="off", top="off", left="off", right="off", labelbottom='off')
-   
-    if cat_index == 0:
-        ax.text(2003, 90, 'Women')
-        ax.text(2005, 5, 'Men')
-    elif cat_index == 5:
-        ax.text(2005, 62, 'Men')
-        ax.text(2003, 30, 'Women')
-        ax.tick_params(labelbottom='on')
-        
-
-        
-plt.show()
+# The grid is already built, so we only update the ticks on the existing axes.
+grid.set_yticks([0, 100])
+grid.figure
 
 
 # In[37]:
@@ -221,87 +97,21 @@ plt.show()
 # Set to the third color (light gray) in the Color Blind 10 palette
 # Has a transparency of 0.3
 #Export the figure containing all of the line charts to "gender_degrees.png"
+grid.show_midline()
+grid.savefig("gender_degrees.png")
+grid.figure
 
-# For all plots:
-# Enable just the y-axis labels at 0 and 100.
-fig = plt.figure(figsize=(16, 20))
-
-##Generate first column for STEM majors
-for sp in range(0,18,3):
-    cat_index = int(sp/3)
-    ax = fig.add_subplot(6,3,sp+1)
-    ax.plot(women_degrees['Year'], women_degrees[stem_cats[cat_index]], c=cb_dark_blue, label='Women', linewidth=3)
-    ax.plot(women_degrees['Year'], 100-women_degrees[stem_cats[cat_index]], c=cb_orange, label='Men', linewidth=3)
-    for key,spine in ax.spines.items():
-        spine.set_visible(False)
-    ax.set_xlim(1968, 2011)
-    ax.set_ylim(0,100)
-    ax.set_yticks([0,100])
-    ax.set_title(stem_cats[cat_index])
-    ax.axhline(50, c=(171/255, 171/255, 171/255), alpha=0.3)
-    ax.tick_params(bottom="off", top="off", left="off", right="off", labelbottom='off')
-    
-    if cat_index == 0:
-        ax.text(2003, 85, 'Women')
-        ax.text(2005, 10, 'Men')
-    elif cat_index == 5:
-        ax.text(2005, 87, 'Men')
-        ax.text(2003, 7, 'Women')
-        ax.tick_params(labelbottom='on')
-        
-# Generate second column of line charts. Liberal arts degrees.
-for sp in range(1,16,3):
-    cat_index = int((sp-1)/3)
-    ax = fig.add_subplot(6,3,sp+1)
-    ax.plot(women_degrees['Year'], women_degrees[lib_arts_cats[cat_index]], c=cb_dark_blue, label='Women', linewidth=3)
-    ax.plot(women_degrees['Year'], 100-women_degrees[lib_arts_cats[cat_index]], c=cb_orange, label='Men', linewidth=3)
-    for key,spine in ax.spines.items():
-        spine.set_visible(False)
-    ax.set_xlim(1968, 2011)
-    ax.set_ylim(0,100)
-    ax.set_yticks([0,100])
-    ax.set_title(lib_arts_cats[cat_index])
-    ax.axhline(50, c=(171/255, 171/255, 171/255), alpha=0.3)
-    ax.tick_params(bottom="off", top="off", left="off", right="off", labelbottom='off')
-    
-    if cat_index == 0:
-        ax.text(2003, 78, 'Women')
-        ax.text(2005, 18, 'Men')
-    elif cat_index == 4:
-        ax.tick_params(labelbottom='on')
-
-## Generate third column of line charts. Other degrees.
-for sp in range(2,20,3):
-    cat_index = int((sp-2)/3)
-    ax = fig.add_subplot(6,3,sp+1)
-    ax.plot(women_degrees['Year'], women_degrees[other_cats[cat_index]], c=cb_dark_blue, label='Women', linewidth=3)
-    ax.plot(women_degrees['Year'], 100-women_degrees[other_cats[cat_index]], c=cb_orange, label='Men', linewidth=3)
-    for key,spine in ax.spines.items():
-        spine.set_visible(False)
-    ax.set_xlim(1968, 2011)
-    ax.set_ylim(0,100)
-    ax.set_yticks([0,100])
-    ax.set_title(other_cats[cat_index])
-    ax.axhline(50, c=(171/255, 171/255, 171/255), alpha=0.3)
-    ax.tick_params(bottom="off", top="off", left="off", right="off", labelbottom='off')
-   
-    if cat_index == 0:
-        ax.text(2003, 90, 'Women')
-        ax.text(2005, 5, 'Men')
-    elif cat_index == 5:
-        ax.text(2005, 62, 'Men')
-        ax.text(2003, 30, 'Women')
-        ax.tick_params(labelbottom='on')
-        
-
-plt.savefig("gender_degrees.png")        
-plt.show()
 
+# For publishing, the same grid can be rendered off-screen and written as PNG/SVG/PDF in one go.
+# The export is skipped if neither the data nor the style changed since the last run.
 
 # In[ ]:
 
 
+from figure_export import ExportJob, export_figures
+from gender_gap import render_grid
 
+export_figures([ExportJob('gender_degrees', render_grid, shares, {'yticks': [0, 100], 'midline': True})])
 
 
 # In[ ]:
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# The "Excel car data" eBay listings notebook as a pipeline of stages (see run_analyses.py).
+
+import os
+
+import pandas as pd
+
+from loading import read_dataset
+from partitioned_store import read_partitioned, write_partitioned
+from pipeline import Stage
+from quality import allowed, check, compare, crawl_year, in_range
+
+
+COLUMNS = ['date_crawled', 'name', 'seller', 'offer_type', 'price', 'abtest',
+           'vehicle_type', 'registration_year', 'gearbox', 'powerPS', 'model',
+           'odometer_km', 'registration_month', 'fuel_type', 'brand',
+           'unrepaired_damage', 'ad_created', 'no_of_pictures', 'postal_code',
+           'last_seen']
+
+#Checked after the numeric cleanup and before the outlier filter, so the report
+#shows what the filter is about to throw away
+RULES = [
+    in_range('price', 1, 351000),
+    in_range('odometer_km', 0, 150000),
+    in_range('registration_year', 1900, 2017),
+    compare('registration_year', '<=', 'crawl_year'),
+    allowed('registration_month', range(0, 13)),
+]
+DERIVED = {'crawl_year': crawl_year('date_crawled')}
+
+
+def load(state):
+    autos = state.get('autos')
+    if autos is None:
+        autos = read_dataset('autos', state.get('autos_path')).frame
+    return {'autos': autos.set_axis(COLUMNS, axis=1)}
+
+
+def clean_numeric(state):
+    #price like "$5,000" and odometer like "150,000km" to ints
+    autos = state['autos']
+    price = autos['price'].astype(str).str.replace(',', '', regex=False).str.replace('$', '', regex=False)
+    odometer = autos['odometer_km'].astype(str).str.replace(',', '', regex=False).str.replace('km', '', regex=False)
+    return {'autos': autos.assign(price=price.astype(int), odometer_km=odometer.astype(int))}
+
+
+def validate(state):
+    report = check(state['autos'], RULES, derive=DERIVED)
+    return {'quality_summary': report.summary.assign(dataset='autos')}
+
+
+def filter_outliers(state):
+    #Same cut-offs as the notebook: no free cars, no time travelling registrations
+    autos = state['autos']
+    keep = autos['price'].between(1, 351000) & autos['registration_year'].between(1900, 2017)
+    return {'autos': autos[keep]}
+
+
+def aggregate_brands(state):
+    #Mean price and mileage for the 20 most common brands
+    autos = state['autos']
+    popular_brands = autos['brand'].value_counts().head(state.get('top_brands', 20)).index
+    means = autos[autos['brand'].isin(popular_brands)].groupby('brand')[['price', 'odometer_km']].mean()
+    sorted_cars_df = (means.astype(int)
+                           .rename(columns={'price': 'mean_price', 'odometer_km': 'mean_mileage'})
+                           .sort_values('mean_mileage', ascending=False))
+    return {'sorted_cars_df': sorted_cars_df}
+
+
+def store(state):
+    #Append this crawl to the partitioned history (run_analyses.py --store DIR).
+    #crawl_start (the day the crawl began) tells crawls apart, so a second crawl in
+    #the same month is added next to the first; only re-running a crawl replaces it
+    if not state.get('store_dir'):
+        return {}
+    autos = state['autos']
+    crawled = pd.to_datetime(autos['date_crawled'], errors='coerce')
+    crawl_start = 'unknown' if crawled.isna().all() else crawled.min().strftime('%Y-%m-%d')
+    root = os.path.join(state['store_dir'], 'autos')
+    write_partitioned(autos.assign(crawl_month=crawled.dt.strftime('%Y-%m').fillna('unknown'),
+                                   crawl_start=crawl_start, brand=autos['brand'].fillna('unknown')),
+                      root, ['crawl_month', 'crawl_start', 'brand'])
+    return {}
+
+
+def mean_price_by_brand(store_dir, year, brands=None):
+    #e.g. mean price per brand in 2016, reading only that year's partitions
+    filters = {'crawl_month': ('%d-01' % year, '%d-12' % year)}
+    if brands is not None:
+        filters['brand'] = list(brands)
+    autos = read_partitioned(os.path.join(store_dir, 'autos'), columns=['brand', 'price'], filters=filters)
+    return autos.groupby('brand')['price'].mean().sort_values(ascending=False)
+
+
+STAGES = [
+    Stage('load', load),
+    Stage('clean_numeric', clean_numeric),
+    Stage('validate', validate),
+    Stage('filter_outliers', filter_outliers),
+    Stage('store', store),
+    Stage('aggregate_brands', aggregate_brands),
+]
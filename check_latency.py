@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Cache-hit latency check for figure_server.py.
+#
+#   python check_latency.py --data percent-bachelors-degrees-women-usa.csv
+#   python check_latency.py --hits 500 --budget-ms 20
+#
+# Starts the server on a free port, renders one figure to warm the cache, then requests the
+# same figure `--hits` times and fails if the p99 of those cache hits is over budget (or if
+# any of them was not served from the cache).
+
+import argparse
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from figure_server import make_server
+
+
+QUERY = '/gender-gap.png?start=1970&end=2011&width=16&height=20&dpi=100'
+
+
+def hit_latencies(women_degrees, hits=200, query=QUERY):
+    """Wall time in ms for each of `hits` cached requests, plus how many weren't hits."""
+    server = make_server(women_degrees, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = 'http://%s:%d%s' % (server.server_address[:2] + (query,))
+    try:
+        urllib.request.urlopen(url).read()
+        timings, misses = [], 0
+        for _ in range(hits):
+            began = time.perf_counter()
+            with urllib.request.urlopen(url) as response:
+                response.read()
+                misses += response.headers['X-Cache'] != 'HIT'
+            timings.append((time.perf_counter() - began) * 1000)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return np.array(timings), misses
+
+
+def check(women_degrees, budget_ms, hits=200):
+    timings, misses = hit_latencies(women_degrees, hits)
+    p50, p99 = np.percentile(timings, [50, 99])
+    problems = []
+    if misses:
+        problems.append('%d of %d requests missed the cache' % (misses, hits))
+    if p99 > budget_ms:
+        problems.append('p99 %.1f ms is over the %.1f ms budget' % (p99, budget_ms))
+    return p50, p99, problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check cache-hit latency of the figure server.')
+    parser.add_argument('--data', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                       'percent-bachelors-degrees-women-usa.csv'))
+    parser.add_argument('--hits', type=int, default=200)
+    parser.add_argument('--budget-ms', type=float, default=50)
+    args = parser.parse_args(argv)
+
+    p50, p99, problems = check(pd.read_csv(args.data), args.budget_ms, args.hits)
+    print('cache hits: p50 %.1f ms, p99 %.1f ms (budget %.1f ms, %d requests)'
+          % (p50, p99, args.budget_ms, args.hits))
+    for problem in problems:
+        print('FAIL: ' + problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Startup budget check for the batch entry points.
+#
+#   python check_startup.py               # default budget
+#   python check_startup.py --budget-ms 800
+#
+# Imports the analysis modules in a fresh interpreter under `python -X importtime`, fails if
+# matplotlib got imported (plotting must stay lazy, see plotting.py) or if the total import
+# time is over budget, and prints the most expensive top-level imports either way.
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+MODULES = ['run_analyses', 'pipeline', 'exit_surveys', 'car_listings', 'college_majors',
+           'gender_gap', 'figure_export', 'figure_server']
+FORBIDDEN = ('matplotlib',)
+
+
+def import_times(modules, cwd=None):
+    """(module, self_us, cumulative_us, depth) for every import in a fresh interpreter."""
+    code = 'import ' + ', '.join(modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, cwd=cwd)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def check(budget_ms, modules=MODULES, cwd=None):
+    rows = import_times(modules, cwd)
+    top_level = [row for row in rows if row[3] == 0]
+    total_ms = sum(row[2] for row in top_level) / 1000
+    forbidden = sorted({row[0] for row in rows if row[0].split('.')[0] in FORBIDDEN})
+    problems = []
+    if forbidden:
+        problems.append('eagerly imported: %s' % ', '.join(forbidden[:5]))
+    if total_ms > budget_ms:
+        problems.append('import time %.0f ms is over the %.0f ms budget' % (total_ms, budget_ms))
+    return total_ms, sorted(top_level, key=lambda row: -row[2]), problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check import-time startup cost of the analyses.')
+    parser.add_argument('--budget-ms', type=float, default=1000)
+    parser.add_argument('--top', type=int, default=10, help='how many of the slowest imports to show')
+    args = parser.parse_args(argv)
+
+    total_ms, slowest, problems = check(args.budget_ms, cwd=os.path.dirname(os.path.abspath(__file__)))
+    print('total import time: %.0f ms (budget %.0f ms)' % (total_ms, args.budget_ms))
+    for name, self_us, cumulative_us, depth in slowest[:args.top]:
+        print('  %8.1f ms  %s' % (cumulative_us / 1000, name))
+    for problem in problems:
+        print('FAIL: ' + problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Helpers for the "Exploring College Majors" project (recent-grads.csv).
+# The notebook answers its questions by eyeballing one scatter plot at a time,
+# these functions do the same work in bulk so it can run over many extracts.
+
+import os
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from pipeline import Stage
+from plotting import pyplot
+
+
+#Columns each analysis in the notebook actually looks at. Loading through
+#RecentGradsLoader reads only the union of these and drops NA rows per analysis.
+ANALYSIS_COLUMNS = {
+    'sample_size_vs_median': ['Sample_size', 'Median'],
+    'sample_size_vs_unemployment': ['Sample_size', 'Unemployment_rate'],
+    'full_time_vs_median': ['Full_time', 'Median'],
+    'share_women_vs_unemployment': ['ShareWomen', 'Unemployment_rate'],
+    'men_vs_median': ['Men', 'Median'],
+    'women_vs_median': ['Women', 'Median'],
+    'popularity_vs_median': ['Total', 'Median'],
+    'share_women_vs_median': ['ShareWomen', 'Median'],
+    'histograms': ['Sample_size', 'Median', 'Employed', 'Full_time', 'ShareWomen',
+                   'Unemployment_rate', 'Men', 'Women'],
+    'scatter_matrix': ['Sample_size', 'Median', 'Unemployment_rate'],
+    'share_women_bars': ['Rank', 'ShareWomen', 'Total'],
+    'unemployment_bars': ['Rank', 'Unemployment_rate', 'Full_time'],
+}
+
+CorrelationReport = namedtuple('CorrelationReport', ['r', 'n', 'ci_low', 'ci_high', 'ranked'])
+Extremes = namedtuple('Extremes', ['top', 'bottom'])
+
+
+class RecentGradsLoader:
+    """Reads only the columns the registered analyses need.
+
+    Each analysis records its columns with `require` (the notebook's ones are
+    pre-registered from ANALYSIS_COLUMNS). Nothing is parsed until the first
+    frame is asked for, and then only the union of required columns is read.
+    NA rows are dropped per analysis on just that analysis' columns, instead of
+    `recent_grads.dropna()` throwing away rows that are missing an unrelated field.
+    """
+
+    def __init__(self, path='recent-grads.csv', analyses=None, data=None, **read_csv_kwargs):
+        #`data` is an already loaded frame (e.g. from loading.py) to take columns from
+        self.path = path
+        self.read_csv_kwargs = read_csv_kwargs
+        self.analyses = {}
+        self._data = data
+        for name, columns in (ANALYSIS_COLUMNS if analyses is None else analyses).items():
+            self.require(name, columns)
+
+    def require(self, name, columns):
+        self.analyses[name] = list(columns)
+        return self
+
+    @property
+    def columns(self):
+        #Union of everything registered, in first-seen order
+        return list(dict.fromkeys(c for cols in self.analyses.values() for c in cols))
+
+    def _load(self):
+        needed = self.columns
+        if self._data is None:
+            self._data = pd.read_csv(self.path, usecols=needed, **self.read_csv_kwargs)
+        else:
+            #Only parse columns registered since the last read
+            missing = [c for c in needed if c not in self._data.columns]
+            if missing:
+                extra = pd.read_csv(self.path, usecols=missing, **self.read_csv_kwargs)
+                self._data = pd.concat([self._data, extra], axis=1)
+        return self._data
+
+    def frame(self, name, dropna=True):
+        columns = self.analyses[name]
+        data = self._load()[columns]
+        if dropna:
+            data = data.dropna(subset=columns)
+        return data
+
+    __getitem__ = frame
+
+
+def _weighted_corr(values, weights=None):
+    #Pairwise-complete (weighted) Pearson correlation for every pair of columns
+    #in one go. Missing values are masked out per pair, so a NaN in one column
+    #doesn't throw away the row for every other pair. Returns r, the number of
+    #rows behind each pair (NaN/zero weight rows don't count) and the Kish
+    #effective sample size (sum w)^2 / sum w^2, which equals the count unweighted.
+    mask = ~np.isnan(values)
+    if weights is None:
+        weights = np.ones(values.shape[0])
+    weights = np.where(np.isnan(weights), 0.0, weights)
+
+    #Centering first keeps the sums of squares small for columns like Total,
+    #it doesn't change the correlation.
+    centered = values - np.nanmean(values, axis=0)
+    x = np.where(mask, centered, 0.0)
+    m = mask.astype(float)
+    wm = m * weights[:, None]
+    wx = x * weights[:, None]
+
+    counts = (m * (weights > 0)[:, None]).T @ m
+    sum_w = wm.T @ m
+    sum_ww = (wm * weights[:, None]).T @ m
+    sum_x = wx.T @ m
+    sum_xx = (wx * x).T @ m
+    sum_xy = wx.T @ x
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = sum_x / sum_w
+        mean_y = sum_x.T / sum_w
+        cov = sum_xy / sum_w - mean_x * mean_y
+        var_x = sum_xx / sum_w - mean_x ** 2
+        var_y = sum_xx.T / sum_w - mean_y ** 2
+        r = cov / np.sqrt(var_x * var_y)
+        effective_n = sum_w ** 2 / sum_ww
+    r = np.clip(r, -1.0, 1.0)
+    np.fill_diagonal(r, np.where(np.diag(counts) > 1, 1.0, np.nan))
+    return r, counts, np.nan_to_num(effective_n)
+
+
+def _ranked_pairs(r, n, ci_low, ci_high, top):
+    #Flatten the upper triangle into a table sorted by strength of relationship
+    cols = r.columns
+    i, j = np.triu_indices(len(cols), k=1)
+    ranked = pd.DataFrame({
+        'x': cols[i],
+        'y': cols[j],
+        'r': r.values[i, j],
+        'n': n.values[i, j],
+        'ci_low': ci_low.values[i, j],
+        'ci_high': ci_high.values[i, j],
+    })
+    ranked = ranked.dropna(subset=['r'])
+    ranked = ranked.iloc[np.argsort(-ranked['r'].abs().values, kind='stable')]
+    ranked = ranked.reset_index(drop=True)
+    if top is not None:
+        ranked = ranked.head(top)
+    return ranked
+
+
+def correlation_report(df, columns=None, method='pearson', weight=None, confidence=0.95, top=20):
+    """Correlation matrix with sample counts and confidence intervals.
+
+    Computes every pair of numeric columns at once instead of one scatter plot
+    at a time. `method` is 'pearson' or 'spearman' (Pearson on average ranks),
+    `weight` names a column to weight rows by, e.g. 'Sample_size'; rows with a
+    missing or zero weight are left out of `n`. Confidence intervals use the
+    Fisher z-transform, with the Kish effective sample size when weighted.
+    Returns a CorrelationReport whose `ranked` table lists the strongest
+    relationships first.
+
+    Pairs are pairwise-complete, but Spearman ranks each whole column once
+    rather than re-ranking the rows complete for each pair, so with missing
+    values it can differ slightly (a few 1e-4 in r) from
+    `DataFrame.corr('spearman')`.
+    """
+    if method not in ('pearson', 'spearman'):
+        raise ValueError("method must be 'pearson' or 'spearman', got %r" % method)
+
+    if columns is None:
+        columns = [c for c in df.select_dtypes(include='number').columns if c != weight]
+    data = df[list(columns)].astype(float)
+    if method == 'spearman':
+        data = data.rank()
+    weights = None if weight is None else df[weight].to_numpy(dtype=float)
+
+    r, counts, effective_n = _weighted_corr(data.to_numpy(), weights)
+
+    #Fisher z interval on the effective sample size, undefined below 4
+    z_crit = NormalDist().inv_cdf(0.5 + confidence / 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.arctanh(np.clip(r, -0.9999999, 0.9999999))
+        se = 1 / np.sqrt(effective_n - 3)
+    se = np.where(effective_n > 3, se, np.nan)
+    ci_low = np.tanh(z - z_crit * se)
+    ci_high = np.tanh(z + z_crit * se)
+
+    def frame(values):
+        return pd.DataFrame(values, index=data.columns, columns=data.columns)
+
+    r, counts, ci_low, ci_high = frame(r), frame(counts.astype(int)), frame(ci_low), frame(ci_high)
+    ranked = _ranked_pairs(r, counts, ci_low, ci_high, top)
+    return CorrelationReport(r, counts, ci_low, ci_high, ranked)
+
+
+def correlation_report_by(df, by, **kwargs):
+    #Run the report once per group (e.g. per survey year) and stack the ranked
+    #tables, so many years of outcomes come back as one table instead of plots.
+    #`by` is one column name or a list of them, one key column each in the output
+    by_columns = list(by) if isinstance(by, (list, tuple)) else [by]
+    tables = []
+    for key, group in df.groupby(by, sort=True):
+        ranked = correlation_report(group.drop(columns=by_columns), **kwargs).ranked
+        key = key if isinstance(key, tuple) else (key,)
+        for position, (column, value) in enumerate(zip(by_columns, key)):
+            ranked.insert(position, column, value)
+        tables.append(ranked)
+    if not tables:
+        return pd.DataFrame()
+    return pd.concat(tables, ignore_index=True)
+
+
+def _extreme_positions(values, n, ascending):
+    #Positions of the n best and n worst values, best first. A single
+    #argpartition with two kth values splits off both ends without sorting
+    #the middle; only the 2n selected rows get sorted.
+    valid = np.flatnonzero(~np.isnan(values))
+    v = values[valid] if ascending else -values[valid]
+    size = len(v)
+    n = min(n, size)
+    if n <= 0:
+        empty = np.array([], dtype=np.intp)
+        return empty, empty
+    if 2 * n >= size:
+        order = np.argsort(v, kind='stable')
+        return valid[order[:n]], valid[order[::-1][:n]]
+    part = np.argpartition(v, [n - 1, size - n])
+    head, tail = part[:n], part[size - n:]
+    head = head[np.argsort(v[head], kind='stable')]
+    tail = tail[np.argsort(v[tail], kind='stable')[::-1]]
+    return valid[head], valid[tail]
+
+
+def top_bottom(df, column, n=10, by=None, ascending=False):
+    """Top and bottom `n` rows of `df` by `column`, without sorting the frame.
+
+    Replaces `recent_grads.head(10)` / `.tail(10)`, which only work because the
+    file happens to be ordered by Rank. "Top" means the largest values unless
+    `ascending=True` (use that for Rank, where 1 is best). With `by`, e.g.
+    'Major_category', the extremes are picked within each group. Rows with a
+    missing `column` are ignored. Returns Extremes(top, bottom), each ordered
+    from the most extreme row inwards.
+    """
+    if by is None:
+        head, tail = _extreme_positions(df[column].to_numpy(dtype=float), n, ascending)
+        return Extremes(df.iloc[head], df.iloc[tail])
+
+    tops, bottoms = [], []
+    values = df[column].to_numpy(dtype=float)
+    for key, positions in df.groupby(by, sort=True).indices.items():
+        head, tail = _extreme_positions(values[positions], n, ascending)
+        tops.append(positions[head])
+        bottoms.append(positions[tail])
+    if not tops:
+        return Extremes(df.iloc[:0], df.iloc[:0])
+    return Extremes(df.iloc[np.concatenate(tops)], df.iloc[np.concatenate(bottoms)])
+
+
+def plot_extremes(extremes, x, y, figsize=(12, 4)):
+    #Side by side bar plots of the two ends, like the head(10)/tail(10) cells
+    plt = pyplot()
+    fig, (ax_top, ax_bottom) = plt.subplots(1, 2, figsize=figsize, sharey=True)
+    extremes.top.plot.bar(x=x, y=y, ax=ax_top, title='Top')
+    extremes.bottom.plot.bar(x=x, y=y, ax=ax_bottom, title='Bottom')
+    return fig
+
+
+# Pipeline stages for run_analyses.py
+
+REPORT_COLUMNS = ['Major', 'Major_category', 'Rank', 'Total', 'Sample_size', 'Men', 'Women',
+                  'ShareWomen', 'Employed', 'Full_time', 'Part_time', 'Median',
+                  'Unemployment_rate', 'Low_wage_jobs']
+
+
+def _grads_loader(path='recent-grads.csv', data=None):
+    return RecentGradsLoader(path, data=data).require('report', REPORT_COLUMNS)
+
+
+#Extra read_csv options for datasets run_analyses.py preloads for these stages, so the
+#preloaded frame is pruned to the same columns RecentGradsLoader would read itself
+LOAD_OPTIONS = {'recent_grads': {'usecols': _grads_loader().columns}}
+
+
+def _load_stage(state):
+    grads = _grads_loader(state.get('grads_path', 'recent-grads.csv'), data=state.get('recent_grads'))
+    return {'grads': grads, 'recent_grads': grads.frame('report', dropna=False)}
+
+
+def _correlation_stage(state):
+    report = correlation_report(state['recent_grads'], method=state.get('method', 'pearson'),
+                                weight=state.get('weight'))
+    return {'correlations': report.ranked}
+
+
+def _extremes_stage(state):
+    recent_grads = state['recent_grads']
+    by_rank = top_bottom(recent_grads, 'Rank', n=10, ascending=True)
+    by_unemployment = top_bottom(recent_grads, 'Unemployment_rate', n=10)
+    return {'top_ranked': by_rank.top, 'bottom_ranked': by_rank.bottom,
+            'highest_unemployment': by_unemployment.top, 'lowest_unemployment': by_unemployment.bottom}
+
+
+def _plot_stage(state):
+    if not state.get('plots', True):
+        return {}
+    grads = state['grads']
+    out_dir = state.get('out_dir', '.')
+    paths = []
+    fig = plot_extremes(top_bottom(grads['share_women_bars'], 'Rank', n=10, ascending=True),
+                        x='ShareWomen', y='Total')
+    paths.append(os.path.join(out_dir, 'share_women_extremes.png'))
+    fig.savefig(paths[-1])
+    fig = plot_extremes(top_bottom(grads['unemployment_bars'], 'Rank', n=10, ascending=True),
+                        x='Unemployment_rate', y='Full_time')
+    paths.append(os.path.join(out_dir, 'unemployment_extremes.png'))
+    fig.savefig(paths[-1])
+    return {'figures': state.get('figures', []) + paths}
+
+
+STAGES = [
+    Stage('load', _load_stage),
+    Stage('correlations', _correlation_stage),
+    Stage('extremes', _extremes_stage),
+    Stage('plot', _plot_stage),
+]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Downsampling for long line-chart series.
+# A plot can't show more points than its axes are pixels wide, so long monthly or
+# per-institution series are reduced to about that many points before plotting,
+# keeping the peaks and crossings that make the chart readable.
+
+import numpy as np
+
+
+def _finite(x, y):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = np.isfinite(x) & np.isfinite(y)
+    if keep.all():
+        return x, y
+    return x[keep], y[keep]
+
+
+def lttb(x, y, n_out):
+    """Largest-triangle-three-buckets downsampling to `n_out` points.
+
+    The first and last points are always kept. The points in between are split
+    into n_out - 2 buckets and from each we keep the point forming the largest
+    triangle with the previously kept point and the mean of the next bucket.
+    Bucket means come from cumulative sums; the per-bucket pick is a NumPy
+    expression, so the Python loop runs n_out times, not len(x) times.
+    Non-finite points are dropped first.
+    """
+    x, y = _finite(x, y)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    starts, ends = edges[:-1], edges[1:]
+    cum_x = np.concatenate([[0.0], np.cumsum(x)])
+    cum_y = np.concatenate([[0.0], np.cumsum(y)])
+    sizes = ends - starts
+    mean_x = (cum_x[ends] - cum_x[starts]) / sizes
+    mean_y = (cum_y[ends] - cum_y[starts]) / sizes
+    #The point after bucket i is the mean of bucket i + 1, or the last point
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        s, e = starts[i], ends[i]
+        area = np.abs((x[a] - next_x[i]) * (y[s:e] - y[a]) - (x[a] - x[s:e]) * (next_y[i] - y[a]))
+        a = s + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def _first_match(y, per_bucket, ids):
+    #Position of the first point in each bucket equal to that bucket's value
+    hits = np.flatnonzero(y == per_bucket[ids])
+    first = np.unique(ids[hits], return_index=True)[1]
+    return hits[first]
+
+
+def minmax(x, y, n_out):
+    """Keep the min and max of each of n_out // 2 equal buckets, fully vectorized.
+
+    Cheaper than lttb and keeps every extreme, at the cost of a slightly
+    noisier line. The first and last points are always kept.
+    """
+    x, y = _finite(x, y)
+    n = len(x)
+    if n_out >= n or n_out < 4:
+        return x, y
+
+    buckets = max(1, (n_out - 2) // 2)
+    starts = np.arange(buckets) * n // buckets
+    ids = np.repeat(np.arange(buckets), np.diff(np.append(starts, n)))
+    lows = _first_match(y, np.minimum.reduceat(y, starts), ids)
+    highs = _first_match(y, np.maximum.reduceat(y, starts), ids)
+    keep = np.unique(np.concatenate([[0, n - 1], lows, highs]))
+    return x[keep], y[keep]
+
+
+METHODS = {'lttb': lttb, 'minmax': minmax}
+
+
+def downsample(x, y, n_out, method='lttb'):
+    if method not in METHODS:
+        raise ValueError("method must be one of %s, got %r" % (sorted(METHODS), method))
+    return METHODS[method](x, y, n_out)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# The "Clean And Analyze Employee Exit Surveys" notebook as a pipeline of stages, so it can
+# run as plain Python (see run_analyses.py). Each stage follows the matching notebook cells.
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from loading import read_dataset
+from partitioned_store import read_partitioned, write_partitioned
+from pipeline import Stage
+from plotting import select_backend
+from quality import check, compare, in_range
+
+
+DETE_DISSATISFACTION_COLS = ['job_dissatisfaction', 'dissatisfaction_with_the_department',
+                             'physical_work_environment', 'lack_of_recognition',
+                             'lack_of_job_security', 'work_location', 'employment_conditions',
+                             'work_life_balance', 'workload']
+TAFE_DISSATISFACTION_COLS = ['Contributing Factors. Dissatisfaction',
+                             'Contributing Factors. Job Dissatisfaction']
+
+TAFE_RENAMES = {'Record ID': 'id', 'CESSATION YEAR': 'cease_date',
+                'Reason for ceasing employment': 'separationtype',
+                'Gender. What is your Gender?': 'gender', 'CurrentAge. Current Age': 'age',
+                'Employment Type. Employment Type': 'employment_status',
+                'Classification. Classification': 'position',
+                'LengthofServiceOverall. Overall Length of Service at Institute (in years)': 'institute_service',
+                'LengthofServiceCurrent. Length of Service at current workplace (in years)': 'role_service'}
+
+#What the notebook checked by eye with value_counts().sort_index()
+DETE_RULES = [
+    in_range('cease_date', 1990, 2014),
+    in_range('dete_start_date', 1940, 2014),
+    compare('cease_date', '>=', 'dete_start_date'),
+]
+TAFE_RULES = [
+    in_range('cease_date', 1990, 2014),
+]
+
+
+def load(state):
+    #Frames preloaded by run_analyses are used as they are
+    dete_survey = state.get('dete_survey')
+    if dete_survey is None:
+        dete_survey = read_dataset('dete_survey', state.get('dete_path')).frame
+    tafe_survey = state.get('tafe_survey')
+    if tafe_survey is None:
+        tafe_survey = read_dataset('tafe_survey', state.get('tafe_path')).frame
+    return {'dete_survey': dete_survey, 'tafe_survey': tafe_survey}
+
+
+def standardize_columns(state):
+    #Drop the columns we don't use and give both surveys the same column names
+    dete = state['dete_survey']
+    tafe = state['tafe_survey']
+    dete_survey_updated = dete.drop(dete.columns[28:49], axis=1)
+    tafe_survey_updated = tafe.drop(tafe.columns[17:66], axis=1)
+    dete_survey_updated.columns = (dete_survey_updated.columns.str.replace('.', '', regex=False)
+                                   .str.replace(r'\s+', '_', regex=True).str.strip().str.lower())
+    tafe_survey_updated = tafe_survey_updated.rename(TAFE_RENAMES, axis=1)
+    return {'dete_survey_updated': dete_survey_updated, 'tafe_survey_updated': tafe_survey_updated}
+
+
+def select_resignations(state):
+    #Fold the three DETE resignation types into plain 'Resignation' first
+    dete = state['dete_survey_updated']
+    dete = dete.assign(separationtype=dete['separationtype'].str.split('-').str[0])
+    tafe = state['tafe_survey_updated']
+    dete_resignations = dete[dete['separationtype'] == 'Resignation'].copy()
+    tafe_resignations = tafe[tafe['separationtype'] == 'Resignation'].copy()
+    return {'dete_resignations': dete_resignations, 'tafe_resignations': tafe_resignations}
+
+
+def clean_service(state):
+    #Cease years as floats, and institute_service for DETE from start/cease years
+    dete = state['dete_resignations']
+    dete['cease_date'] = dete['cease_date'].astype(str).str.split('/').str[-1].astype(float)
+    dete['institute_service'] = dete['cease_date'] - dete['dete_start_date']
+    return {'dete_resignations': dete}
+
+
+def validate(state):
+    dete = check(state['dete_resignations'], DETE_RULES)
+    tafe = check(state['tafe_resignations'], TAFE_RULES)
+    summary = pd.concat([dete.summary.assign(dataset='dete_resignations'),
+                         tafe.summary.assign(dataset='tafe_resignations')], ignore_index=True)
+    return {'quality_summary': summary}
+
+
+def flag_dissatisfied(state):
+    dete = state['dete_resignations']
+    tafe = state['tafe_resignations']
+    #'-' means the factor wasn't picked, anything else means it was, NaN stays NaN
+    factors = tafe[TAFE_DISSATISFACTION_COLS]
+    factors = (factors != '-').astype(object).where(factors.notna(), np.nan)
+    tafe['dissatisfied'] = factors.any(axis=1, skipna=False)
+    dete['dissatisfied'] = dete[DETE_DISSATISFACTION_COLS].any(axis=1, skipna=False)
+    return {'dete_resignations': dete, 'tafe_resignations': tafe}
+
+
+def combine(state):
+    dete = state['dete_resignations'].assign(institute='DETE')
+    tafe = state['tafe_resignations'].assign(institute='TAFE')
+    combined = pd.concat([dete, tafe], ignore_index=True)
+    #Drop columns with less than 500 non-null values
+    return {'combined_updated': combined.dropna(thresh=500, axis=1)}
+
+
+def categorize_service(state):
+    combined = state['combined_updated']
+    years = combined['institute_service'].astype(str).str.extract(r'(\d+)', expand=False).astype(float)
+    service_cat = pd.cut(years, [-np.inf, 3, 7, 11, np.inf], right=False,
+                         labels=['New', 'Experienced', 'Established', 'Veteran']).astype(object)
+    combined = combined.assign(institute_service_up=years, service_cat=service_cat.where(years.notna()),
+                               dissatisfied=combined['dissatisfied'].fillna(False).astype(bool))
+    return {'combined_updated': combined}
+
+
+def aggregate(state):
+    #Share of dissatisfied employees in each service category
+    service_cat_pvtable = state['combined_updated'].pivot_table(values='dissatisfied', index='service_cat')
+    return {'service_cat_pvtable': service_cat_pvtable}
+
+
+def plot(state):
+    if not state.get('plots', True):
+        return {}
+    select_backend()
+    ax = state['service_cat_pvtable'].plot(kind='bar', rot=30)
+    path = os.path.join(state.get('out_dir', '.'), 'service_cat_dissatisfaction.png')
+    ax.figure.savefig(path)
+    return {'figures': state.get('figures', []) + [path]}
+
+
+def _extract_id(survey):
+    #Short content hash of a raw survey file: re-running the same extract gets the same id
+    hashes = pd.util.hash_pandas_object(survey, index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:12]
+
+
+def store(state):
+    #Add these surveys to the partitioned history (run_analyses.py --store DIR).
+    #The extract level keeps a newer extract covering the same cease years from
+    #replacing an older one; only re-running the same extract replaces its rows.
+    #Surveys without a cease date go under cease_year=0 rather than a null key.
+    if not state.get('store_dir'):
+        return {}
+    combined = state['combined_updated']
+    extracts = {'DETE': _extract_id(state['dete_survey']), 'TAFE': _extract_id(state['tafe_survey'])}
+    cease_year = combined['cease_date'].astype('Int64').fillna(0)
+    root = os.path.join(state['store_dir'], 'exit_surveys')
+    write_partitioned(combined.assign(cease_year=cease_year, extract=combined['institute'].map(extracts)),
+                      root, ['cease_year', 'institute', 'extract'])
+    return {}
+
+
+def dissatisfaction_by_service(store_dir, institute=None, years=None):
+    #e.g. dissatisfaction by service_cat for TAFE 2012-2013: only those partitions are read
+    filters = {}
+    if institute is not None:
+        filters['institute'] = institute
+    if years is not None:
+        filters['cease_year'] = years
+    combined = read_partitioned(os.path.join(store_dir, 'exit_surveys'),
+                                columns=['service_cat', 'dissatisfied'], filters=filters)
+    return combined.pivot_table(values='dissatisfied', index='service_cat')
+
+
+STAGES = [
+    Stage('load', load),
+    Stage('standardize_columns', standardize_columns),
+    Stage('select_resignations', select_resignations),
+    Stage('clean_service', clean_service),
+    Stage('validate', validate),
+    Stage('flag_dissatisfied', flag_dissatisfied),
+    Stage('combine', combine),
+    Stage('categorize_service', categorize_service),
+    Stage('store', store),
+    Stage('aggregate', aggregate),
+    Stage('plot', plot),
+]
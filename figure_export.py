@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Headless export pipeline for the project figures.
+# Each job renders one figure off-screen and writes every format/DPI we publish from that
+# figure. Jobs run in a process pool and are skipped entirely when the hash of their input
+# data and style spec matches what was exported last time.
+
+import hashlib
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from plotting import select_backend
+
+
+ExportJob = namedtuple('ExportJob', ['name', 'render', 'data', 'style'])
+
+VECTOR_FORMATS = ('svg', 'pdf')
+CACHE_FILE = '.export-cache.json'
+
+
+def spec_hash(data, style):
+    #Hash of the input frame (values and labels) plus the style spec. The render
+    #function name is part of the style via the job, see _job_hash.
+    digest = hashlib.sha256()
+    if isinstance(data, pd.DataFrame):
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+        digest.update(json.dumps([str(c) for c in data.columns]).encode())
+    else:
+        digest.update(repr(data).encode())
+    digest.update(json.dumps(style, sort_keys=True, default=repr).encode())
+    return digest.hexdigest()
+
+
+def _job_hash(job, formats, dpis):
+    render = '%s.%s' % (job.render.__module__, job.render.__qualname__)
+    return spec_hash(job.data, {'render': render, 'style': job.style,
+                                'formats': list(formats), 'dpis': list(dpis)})
+
+
+def output_paths(name, out_dir, formats, dpis):
+    #Raster formats get one file per DPI, vector formats are DPI independent
+    paths = []
+    for fmt in formats:
+        if fmt in VECTOR_FORMATS:
+            paths.append((os.path.join(out_dir, '%s.%s' % (name, fmt)), fmt, None))
+        else:
+            for dpi in dpis:
+                paths.append((os.path.join(out_dir, '%s@%ddpi.%s' % (name, dpi, fmt)), fmt, dpi))
+    return paths
+
+
+def write_figure(figure, name, out_dir, formats=('png', 'svg', 'pdf'), dpis=(100, 200)):
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for path, fmt, dpi in output_paths(name, out_dir, formats, dpis):
+        figure.savefig(path, format=fmt, dpi=dpi if dpi is not None else 'figure')
+        written.append(path)
+    return written
+
+
+def _headless_worker():
+    #Workers never need a display, pin them to Agg before anything imports pyplot
+    select_backend(force=True)
+
+
+def _render_and_write(job, out_dir, formats, dpis):
+    figure = job.render(job.data, job.style)
+    return write_figure(figure, job.name, out_dir, formats, dpis)
+
+
+def _read_cache(out_dir):
+    try:
+        with open(os.path.join(out_dir, CACHE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(out_dir, cache):
+    path = os.path.join(out_dir, CACHE_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def export_figures(jobs, out_dir='figures', formats=('png', 'svg', 'pdf'), dpis=(100, 200),
+                   processes=None, force=False):
+    """Render and write every job, skipping the ones whose inputs are unchanged.
+
+    `jobs` is a list of ExportJob. `render(data, style)` must be a module level
+    function returning a matplotlib Figure so it can be sent to a worker process.
+    With `processes=0` everything runs in this process. Returns a dict of job
+    name -> list of written paths, and 'cached' for skipped jobs.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    cache = _read_cache(out_dir)
+    results = {}
+    pending = []
+    for job in jobs:
+        key = _job_hash(job, formats, dpis)
+        paths = [p for p, fmt, dpi in output_paths(job.name, out_dir, formats, dpis)]
+        if not force and cache.get(job.name) == key and all(os.path.exists(p) for p in paths):
+            results[job.name] = 'cached'
+        else:
+            pending.append((job, key))
+
+    #Record finished jobs even if a later one fails, so a rerun only redoes the rest
+    try:
+        if processes == 0 or len(pending) <= 1:
+            for job, key in pending:
+                results[job.name] = _render_and_write(job, out_dir, formats, dpis)
+                cache[job.name] = key
+        else:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_headless_worker) as pool:
+                futures = [(job, key, pool.submit(_render_and_write, job, out_dir, formats, dpis))
+                           for job, key in pending]
+                for job, key, future in futures:
+                    results[job.name] = future.result()
+                    cache[job.name] = key
+    finally:
+        _write_cache(out_dir, cache)
+    return results
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Small local HTTP service that renders gender-gap panels on demand.
+#
+#   GET /gender-gap.png?groups=Biology,English;Education&start=1970&end=2011&width=16&height=20&dpi=100
+#   GET /stats
+#
+# `groups` is one column per ';' separated list of categories (defaults to the notebook's
+# three columns). Grids are built once per set of groups and then reused: a request only
+# swaps in the data for its year range, resizes the figure and prints it on the same Agg
+# canvas. Rendered bytes go into a size-bounded LRU keyed by the normalized parameters.
+
+import argparse
+import json
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from gender_gap import DEFAULT_GROUPS, GenderGapGrid, prepare_shares
+
+
+class LRUBytesCache:
+    """Least-recently-used cache of rendered images, bounded by total bytes."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class GridRenderer:
+    """Renders PNG bytes for a request, reusing one grid per set of groups."""
+
+    def __init__(self, women_degrees, style=None, max_grids=8):
+        self.shares = prepare_shares(women_degrees)
+        self.categories = set(self.shares['women'].columns)
+        self.style = style or {'yticks': [0, 100], 'midline': True}
+        self.max_grids = max_grids
+        self._grids = OrderedDict()
+        #Agg figures aren't safe to draw from two threads at once
+        self._lock = threading.Lock()
+
+    def normalize(self, groups=None, start=None, end=None, width=16, height=20, dpi=100):
+        #Canonical form of a request, used both to render and as the cache key
+        groups = DEFAULT_GROUPS if groups is None else groups
+        groups = tuple(tuple(group) for group in groups if group)
+        unknown = [cat for group in groups for cat in group if cat not in self.categories]
+        if not groups:
+            raise ValueError('no categories requested')
+        if unknown:
+            raise ValueError('unknown categories: %s' % ', '.join(unknown))
+        requested = [cat for group in groups for cat in group]
+        duplicates = sorted({cat for cat in requested if requested.count(cat) > 1})
+        if duplicates:
+            raise ValueError('categories appear more than once: %s' % ', '.join(duplicates))
+        years = self.shares.index
+        start = float(years.min() if start is None else start)
+        end = float(years.max() if end is None else end)
+        if not (math.isfinite(start) and math.isfinite(end)):
+            raise ValueError('start and end must be finite')
+        if start >= end:
+            raise ValueError('start must be before end')
+        width, height, dpi = float(width), float(height), int(dpi)
+        if not (0 < width <= 50 and 0 < height <= 50 and 10 <= dpi <= 600):
+            raise ValueError('size out of range')
+        return groups, start, end, width, height, dpi
+
+    def _grid(self, groups):
+        grid = self._grids.pop(groups, None)
+        if grid is None:
+            grid = GenderGapGrid(self.shares, groups=groups, style=self.style, use_pyplot=False)
+            if len(self._grids) >= self.max_grids:
+                self._grids.popitem(last=False)
+        self._grids[groups] = grid
+        return grid
+
+    def render(self, groups, start, end, width, height, dpi):
+        years = self.shares.index.to_numpy(dtype=float)
+        rows = (years >= start) & (years <= end)
+        with self._lock:
+            grid = self._grid(groups)
+            grid.figure.set_dpi(dpi)
+            grid.figure.set_size_inches(width, height)
+            grid.set_data(self.shares[rows]).set_xlim(start, end)
+            out = BytesIO()
+            grid.figure.canvas.print_png(out)
+        return out.getvalue()
+
+
+class LatencyLog:
+    #Last `window` request timings for hits and misses, for the /stats endpoint
+
+    def __init__(self, window=10000):
+        self.timings = {'hit': deque(maxlen=window), 'miss': deque(maxlen=window)}
+        self._lock = threading.Lock()
+
+    def record(self, kind, seconds):
+        with self._lock:
+            self.timings[kind].append(seconds)
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for kind, values in self.timings.items():
+                values = np.array(values)
+                entry = {'count': int(values.size)}
+                if values.size:
+                    p50, p99 = np.percentile(values, [50, 99]) * 1000
+                    entry.update(p50_ms=round(float(p50), 3), p99_ms=round(float(p99), 3))
+                result[kind] = entry
+            return result
+
+
+def _parse_groups(value):
+    return [[cat.strip() for cat in group.split(',') if cat.strip()] for group in value.split(';')]
+
+
+class FigureRequestHandler(BaseHTTPRequestHandler):
+    #server.renderer, server.cache and server.latency are set up by make_server
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            stats = self.server.latency.summary()
+            stats['cache'] = {'entries': len(self.server.cache), 'bytes': self.server.cache.size,
+                              'max_bytes': self.server.cache.max_bytes}
+            self._send(200, 'application/json', json.dumps(stats).encode())
+        elif url.path == '/gender-gap.png':
+            self._send_figure(url.query)
+        else:
+            self._send(404, 'text/plain', b'not found')
+
+    def _send_figure(self, query):
+        began = time.perf_counter()
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        try:
+            key = self.server.renderer.normalize(
+                groups=_parse_groups(params['groups']) if 'groups' in params else None,
+                start=params.get('start'), end=params.get('end'),
+                width=params.get('width', 16), height=params.get('height', 20),
+                dpi=params.get('dpi', 100))
+        except ValueError as error:
+            self._send(400, 'text/plain', str(error).encode())
+            return
+
+        body = self.server.cache.get(key)
+        kind = 'hit' if body is not None else 'miss'
+        if body is None:
+            try:
+                body = self.server.renderer.render(*key)
+            except Exception as error:
+                #Answer instead of dropping the connection on a bad render
+                self._send(500, 'text/plain', ('render failed: %s' % error).encode())
+                return
+            self.server.cache.put(key, body)
+        self._send(200, 'image/png', body, {'X-Cache': kind.upper()})
+        self.server.latency.record(kind, time.perf_counter() - began)
+
+    def _send(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        #Keep the console quiet, /stats has the numbers
+        pass
+
+
+def make_server(women_degrees, host='127.0.0.1', port=8050, cache_bytes=64 * 1024 * 1024, style=None):
+    """Build (but don't start) the server. Use port=0 to get a free port, e.g. in tests."""
+    server = ThreadingHTTPServer((host, port), FigureRequestHandler)
+    server.renderer = GridRenderer(women_degrees, style=style)
+    server.cache = LRUBytesCache(cache_bytes)
+    server.latency = LatencyLog()
+    return server
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Serve gender-gap charts on demand.')
+    parser.add_argument('--data', default='percent-bachelors-degrees-women-usa.csv')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--cache-mb', type=float, default=64)
+    args = parser.parse_args(argv)
+
+    server = make_server(pd.read_csv(args.data), args.host, args.port, int(args.cache_mb * 1024 * 1024))
+    print('Serving on http://%s:%d/gender-gap.png' % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Small-multiples renderer for the "Visualizing The Gender Gap In College Degrees" project.
+# The notebook rebuilt the same 6x3 grid four times, once per tweak. GenderGapGrid builds
+# the axes, lines and annotations once and then changes the existing artists in place.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from downsample import downsample
+from loading import read_dataset
+from pipeline import Stage
+from plotting import pyplot
+
+
+cb_dark_blue = (0/255, 107/255, 164/255)
+cb_orange = (255/255, 128/255, 14/255)
+cb_light_gray = (171/255, 171/255, 171/255)
+
+stem_cats = ['Psychology', 'Biology', 'Math and Statistics', 'Physical Sciences', 'Computer Science', 'Engineering']
+lib_arts_cats = ['Foreign Languages', 'English', 'Communications and Journalism', 'Art and Performance', 'Social Sciences and History']
+other_cats = ['Health Professions', 'Public Administration', 'Education', 'Agriculture', 'Business', 'Architecture']
+
+DEFAULT_GROUPS = [stem_cats, lib_arts_cats, other_cats]
+
+#Everything the four notebook figures had in common. Annotations are keyed by
+#(column, row) with row -1 meaning the bottom plot of that column.
+DEFAULT_STYLE = {
+    'figsize': (16, 20),
+    'women_color': cb_dark_blue,
+    'men_color': cb_orange,
+    'linewidth': 3,
+    'xlim': (1968, 2011),
+    'ylim': (0, 100),
+    'yticks': None,
+    'midline': False,
+    'midline_y': 50,
+    'midline_color': cb_light_gray,
+    'midline_alpha': 0.3,
+    'bottom_labels': 'last',
+    #None plots every point, 'lttb' or 'minmax' reduces each series to
+    #max_points (default: the axes width in pixels) before plotting
+    'downsample': None,
+    'max_points': None,
+    'annotations': {
+        (0, 0): [(2003, 85, 'Women'), (2005, 10, 'Men')],
+        (0, -1): [(2005, 87, 'Men'), (2003, 7, 'Women')],
+        (1, 0): [(2003, 78, 'Women'), (2005, 18, 'Men')],
+        (2, 0): [(2003, 90, 'Women'), (2005, 5, 'Men')],
+        (2, -1): [(2005, 62, 'Men'), (2003, 30, 'Women')],
+    },
+}
+
+
+def prepare_shares(women_degrees, categories=None, x='Year', gap=False, trend_window=None):
+    """Every derived series the renderers need, computed once.
+
+    Returns a frame indexed by `x` whose columns are (series, category) with
+    series 'women', 'men' and optionally 'gap' (women - men) and 'trend'
+    (centred rolling mean of the women share over `trend_window` rows). All of
+    it sits in one float array built with whole-array operations, instead of
+    `100 - women_degrees[cat]` being recomputed for every subplot of every figure.
+    """
+    if categories is None:
+        categories = [c for c in women_degrees.columns if c != x]
+    categories = list(categories)
+    women = women_degrees[categories].to_numpy(dtype=float)
+    men = 100 - women
+    names, blocks = ['women', 'men'], [women, men]
+    if gap:
+        names.append('gap')
+        blocks.append(women - men)
+    if trend_window:
+        names.append('trend')
+        trend = pd.DataFrame(women).rolling(trend_window, min_periods=1, center=True).mean()
+        blocks.append(trend.to_numpy())
+    values = np.ascontiguousarray(np.concatenate(blocks, axis=1))
+    columns = pd.MultiIndex.from_product([names, categories], names=['series', 'category'])
+    index = pd.Index(women_degrees[x].to_numpy(), name=x)
+    return pd.DataFrame(values, index=index, columns=columns, copy=False)
+
+
+def _is_prepared(frame):
+    return isinstance(frame.columns, pd.MultiIndex) and 'women' in frame.columns.get_level_values(0)
+
+
+class GenderGapGrid:
+    """Grid of women/men line charts, one column per category group.
+
+    The figure, axes, lines, spines and annotations are created once. The
+    `set_*` methods change the existing artists in place (tick locations, the
+    50% line, x labels, the plotted data), so regenerating the grid for a new
+    demographic split doesn't pay for rebuilding 17 subplots again.
+    """
+
+    def __init__(self, women_degrees, groups=None, style=None, use_pyplot=True):
+        self.groups = [list(g) for g in (DEFAULT_GROUPS if groups is None else groups)]
+        #Axes and lines are looked up by category, so each can only be drawn once
+        duplicates = sorted({cat for cat in self.categories if self.categories.count(cat) > 1})
+        if duplicates:
+            raise ValueError('categories appear more than once: %s' % ', '.join(duplicates))
+        self.style = dict(DEFAULT_STYLE, **(style or {}))
+        #The default annotations sit at spots picked for the notebook's panels,
+        #other groups only get the ones passed in explicitly
+        if self.groups != DEFAULT_GROUPS and 'annotations' not in (style or {}):
+            self.style['annotations'] = {}
+        self.axes = {}
+        self.lines = {}
+        self.midlines = {}
+        self.figure = self._new_figure(use_pyplot)
+        self._build()
+        self.set_data(women_degrees)
+        self.set_yticks(self.style['yticks'])
+        self.show_midline(self.style['midline'])
+        self.set_bottom_labels(self.style['bottom_labels'])
+
+    def _new_figure(self, use_pyplot):
+        if use_pyplot:
+            return pyplot().figure(figsize=self.style['figsize'])
+        #Plain Agg figure, not registered with pyplot so it can be kept and
+        #redrawn without piling up open figures
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        figure = Figure(figsize=self.style['figsize'])
+        FigureCanvasAgg(figure)
+        return figure
+
+    @property
+    def categories(self):
+        return [cat for group in self.groups for cat in group]
+
+    def _build(self):
+        style = self.style
+        nrows = max(len(group) for group in self.groups)
+        ncols = len(self.groups)
+        for col, group in enumerate(self.groups):
+            for row, cat in enumerate(group):
+                ax = self.figure.add_subplot(nrows, ncols, row * ncols + col + 1)
+                women, = ax.plot([], [], c=style['women_color'], label='Women', linewidth=style['linewidth'])
+                men, = ax.plot([], [], c=style['men_color'], label='Men', linewidth=style['linewidth'])
+                for key, spine in ax.spines.items():
+                    spine.set_visible(False)
+                ax.set_xlim(*style['xlim'])
+                ax.set_ylim(*style['ylim'])
+                ax.set_title(cat)
+                ax.tick_params(bottom=False, top=False, left=False, right=False)
+                for key in ((col, row), (col, row - len(group))):
+                    for x, y, text in style['annotations'].get(key, []):
+                        ax.text(x, y, text, clip_on=True)
+                self.axes[cat] = ax
+                self.lines[cat] = (women, men)
+
+    def set_data(self, women_degrees, x='Year'):
+        #Swap the plotted series without touching anything else on the axes.
+        #Takes the raw csv frame or the output of prepare_shares.
+        shares = women_degrees if _is_prepared(women_degrees) else prepare_shares(women_degrees, self.categories, x)
+        years = shares.index.to_numpy(dtype=float)
+        women = shares['women'][self.categories].to_numpy()
+        men = shares['men'][self.categories].to_numpy()
+        method = self.style['downsample']
+        for i, cat in enumerate(self.categories):
+            women_line, men_line = self.lines[cat]
+            if method is None:
+                women_line.set_data(years, women[:, i])
+                men_line.set_data(years, men[:, i])
+            else:
+                n_out = self.style['max_points'] or int(self.axes[cat].bbox.width)
+                women_line.set_data(*downsample(years, women[:, i], n_out, method))
+                men_line.set_data(*downsample(years, men[:, i], n_out, method))
+        return self
+
+    def set_xlim(self, left, right):
+        for ax in self.axes.values():
+            ax.set_xlim(left, right)
+        return self
+
+    def set_yticks(self, ticks):
+        for ax in self.axes.values():
+            if ticks is None:
+                ax.yaxis.set_major_locator(_default_locator())
+            else:
+                ax.set_yticks(ticks)
+        return self
+
+    def show_midline(self, visible=True):
+        #The 50% line is created the first time it's needed and only toggled after that
+        style = self.style
+        for cat, ax in self.axes.items():
+            line = self.midlines.get(cat)
+            if line is None:
+                if not visible:
+                    continue
+                line = ax.axhline(style['midline_y'], c=style['midline_color'], alpha=style['midline_alpha'])
+                self.midlines[cat] = line
+            line.set_visible(visible)
+        return self
+
+    def set_bottom_labels(self, which='last'):
+        #'last' shows year labels only under the bottom plot of each column,
+        #True/False turns them on/off everywhere
+        for group in self.groups:
+            for row, cat in enumerate(group):
+                if which == 'last':
+                    on = row == len(group) - 1
+                else:
+                    on = bool(which)
+                self.axes[cat].tick_params(labelbottom=on)
+        return self
+
+    def savefig(self, path, **kwargs):
+        self.figure.savefig(path, **kwargs)
+        return path
+
+
+def render_grid(women_degrees, style=None):
+    #Off-screen render for figure_export: style may carry 'groups' alongside the
+    #usual DEFAULT_STYLE keys
+    style = dict(style or {})
+    groups = style.pop('groups', None)
+    return GenderGapGrid(women_degrees, groups=groups, style=style, use_pyplot=False).figure
+
+
+def _default_locator():
+    from matplotlib.ticker import AutoLocator
+    return AutoLocator()
+
+
+# Pipeline stages for run_analyses.py
+
+def _load_stage(state):
+    if state.get('women_degrees') is not None:
+        return {}
+    return {'women_degrees': read_dataset('women_degrees', state.get('degrees_path')).frame}
+
+
+def _prepare_stage(state):
+    return {'shares': prepare_shares(state['women_degrees'], gap=True)}
+
+
+def _plot_stage(state):
+    if not state.get('plots', True):
+        return {}
+    path = os.path.join(state.get('out_dir', '.'), 'gender_degrees.png')
+    render_grid(state['shares'], {'yticks': [0, 100], 'midline': True}).savefig(path)
+    return {'figures': state.get('figures', []) + [path]}
+
+
+STAGES = [
+    Stage('load', _load_stage),
+    Stage('prepare_shares', _prepare_stage),
+    Stage('plot', _plot_stage),
+]
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Partitioned Parquet storage for the cleaned car listings and exit surveys.
+# Each run writes its cleaned frame into a hive-style directory tree, e.g.
+#
+#   store/autos/crawl_month=2016-03/crawl_start=2016-03-05/brand=volkswagen/part-0.parquet
+#   store/exit_surveys/cease_year=2012/institute=TAFE/extract=3f9c0e1a2b4d/part-0.parquet
+#
+# Writing a crawl or survey extract only replaces the partitions it contains, so history
+# accumulates across runs. The partition columns have to identify a run's data (hence
+# crawl_start for listings and extract for surveys): anything else written to the same
+# directories is deleted. For the same reason partition keys can't be missing, or every
+# run's rows without one would share, and keep replacing, a single partition.
+# Reads take partition filters and only open the directories that match, plus just the
+# columns asked for, so a question about one brand in one year never loads the rest of the
+# history into memory.
+#
+# Needs pyarrow (pip install pyarrow); it is only imported when the store is used.
+
+import os
+
+import pandas as pd
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError:
+        raise ImportError('partitioned_store needs pyarrow: pip install pyarrow') from None
+    return pa, ds
+
+
+def _arrow_safe(df):
+    #Object columns holding a mix of types (e.g. institute_service is a number for
+    #DETE and text like '1-2' for TAFE) are stored as text
+    fixes = {}
+    for column in df.columns[df.dtypes == object]:
+        kind = pd.api.types.infer_dtype(df[column], skipna=True)
+        if kind.startswith('mixed'):
+            fixes[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    return df.assign(**fixes) if fixes else df
+
+
+def write_partitioned(df, root, partition_cols):
+    """Write `df` under `root`, replacing only the partitions that `df` has rows for."""
+    missing = [column for column in partition_cols if df[column].isna().any()]
+    if missing:
+        raise ValueError('missing values in partition columns: %s' % ', '.join(missing))
+    pa, ds = _pyarrow()
+    table = pa.Table.from_pandas(_arrow_safe(df), preserve_index=False)
+    partitioning = ds.partitioning(table.select(partition_cols).schema, flavor='hive')
+    os.makedirs(root, exist_ok=True)
+    ds.write_dataset(table, root, format='parquet', partitioning=partitioning,
+                     existing_data_behavior='delete_matching',
+                     basename_template='part-{i}.parquet')
+    return root
+
+
+def _filter_expression(ds, filters):
+    #{'brand': 'bmw', 'institute': ['DETE', 'TAFE'], 'cease_year': (2012, 2013)}
+    #means equality, membership and an inclusive range respectively
+    expression = None
+    for column, value in (filters or {}).items():
+        field = ds.field(column)
+        if isinstance(value, tuple):
+            low, high = value
+            term = None
+            if low is not None:
+                term = field >= low
+            if high is not None:
+                term = (field <= high) if term is None else term & (field <= high)
+        elif isinstance(value, (list, set, frozenset)):
+            term = field.isin(list(value))
+        else:
+            term = field == value
+        if term is not None:
+            expression = term if expression is None else expression & term
+    return expression
+
+
+def read_partitioned(root, columns=None, filters=None):
+    """Read the matching partitions of a store written by write_partitioned.
+
+    `filters` maps column names to a value, a list of values or an inclusive
+    (low, high) tuple; filters on partition columns prune whole directories.
+    """
+    _, ds = _pyarrow()
+    dataset = ds.dataset(root, format='parquet', partitioning='hive')
+    table = dataset.to_table(columns=columns, filter=_filter_expression(ds, filters))
+    return table.to_pandas()
+
+
+def partition_paths(root, filters=None):
+    #Files a read with these filters would open, handy for checking the pruning
+    _, ds = _pyarrow()
+    dataset = ds.dataset(root, format='parquet', partitioning='hive')
+    return sorted(fragment.path for fragment in dataset.get_fragments(filter=_filter_expression(ds, filters)))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Tiny stage runner shared by the analyses.
+# A pipeline is a list of Stage(name, func). Each func takes the state dict (input paths,
+# options and everything earlier stages produced) and returns a dict of new entries, which
+# get merged into the state. The runner times each stage and counts the rows it produced.
+#
+# With audit_memory=True it also records, per stage, the tracemalloc peak and retained
+# bytes, the deep memory_usage of every frame the stage produced, and which of those frames
+# were full copies of an earlier frame that nothing ever modified afterwards.
+
+import hashlib
+import time
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+Stage = namedtuple('Stage', ['name', 'func'])
+StageStats = namedtuple('StageStats', ['pipeline', 'stage', 'wall', 'cpu', 'rows', 'memory'],
+                        defaults=[None])
+
+
+def _row_counts(produced):
+    return {key: len(value) for key, value in produced.items()
+            if isinstance(value, (pd.DataFrame, pd.Series))}
+
+
+def _frame_bytes(produced):
+    return {key: int(np.sum(value.memory_usage(deep=True))) for key, value in produced.items()
+            if isinstance(value, (pd.DataFrame, pd.Series))}
+
+
+def _content_hash(frame):
+    return hashlib.sha1(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes()).hexdigest()
+
+
+def _shares_memory(a, b):
+    #Any column backed by the same buffer means it's a view, not a copy
+    for column in a.columns.intersection(b.columns):
+        left, right = a[column], b[column]
+        if isinstance(left, pd.Series) and isinstance(right, pd.Series):
+            if np.shares_memory(left.to_numpy(), right.to_numpy()):
+                return True
+    return False
+
+
+def _find_copies(produced, state):
+    #Frames this stage produced that are new objects with exactly the same
+    #labels and contents as a frame already in the state. A frame that shares
+    #buffers with any earlier frame is a view, whatever else it happens to equal
+    copies = []
+    earlier = [(key, value) for key, value in state.items() if isinstance(value, pd.DataFrame)]
+    for key, value in produced.items():
+        if not isinstance(value, pd.DataFrame) or any(value is other or _shares_memory(value, other)
+                                                      for _, other in earlier):
+            continue
+        for source_key, source in earlier:
+            if (value.shape == source.shape and value.columns.equals(source.columns)
+                    and value.index.equals(source.index)):
+                digest = _content_hash(value)
+                if digest == _content_hash(source):
+                    copies.append({'key': key, 'source': source_key, 'frame': value, 'hash': digest})
+                    break
+    return copies
+
+
+def run_pipeline(name, stages, state=None, audit_memory=False):
+    """Run `stages` in order, returning (state, [StageStats, ...])."""
+    state = dict(state or {})
+    stats = []
+    copies = []
+    started_tracing = audit_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        for stage in stages:
+            if audit_memory:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            #CPU time of this thread only, datasets may still be loading on others
+            wall, cpu = time.perf_counter(), time.thread_time()
+            produced = stage.func(state) or {}
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+
+            memory = None
+            if audit_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                memory = {'peak_bytes': peak - before, 'retained_bytes': current - before,
+                          'frame_bytes': _frame_bytes(produced), 'unmutated_copies': []}
+                for copy in _find_copies(produced, state):
+                    copy['stats'] = memory
+                    copies.append(copy)
+            state.update(produced)
+            stats.append(StageStats(name, stage.name, wall, cpu, _row_counts(produced), memory))
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    #A copy only earns its keep if a later stage modified it
+    for copy in copies:
+        if _content_hash(copy['frame']) == copy['hash']:
+            copy['stats']['unmutated_copies'].append({
+                'key': copy['key'], 'source': copy['source'],
+                'bytes': int(copy['frame'].memory_usage(deep=True).sum())})
+    return state, stats
+
+
+def memory_report(stats):
+    """Machine-readable (JSON-ready) summary of audited pipeline runs."""
+    report = {'stages': [], 'pipelines': {}}
+    for s in stats:
+        if s.memory is None:
+            continue
+        report['stages'].append(dict(pipeline=s.pipeline, stage=s.stage, wall_s=s.wall, cpu_s=s.cpu,
+                                     rows=s.rows, **s.memory))
+        pipeline = report['pipelines'].setdefault(s.pipeline, {'peak_bytes': 0, 'unmutated_copy_bytes': 0})
+        pipeline['peak_bytes'] = max(pipeline['peak_bytes'], s.memory['peak_bytes'])
+        pipeline['unmutated_copy_bytes'] += sum(c['bytes'] for c in s.memory['unmutated_copies'])
+    try:
+        import resource
+        report['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        pass
+    return report
+
+
+def format_profile(stats):
+    #Plain text table, one line per stage plus a total per pipeline
+    audited = any(s.memory is not None for s in stats)
+    header = '%-14s %-22s %9s %9s' % ('pipeline', 'stage', 'wall_s', 'cpu_s')
+    if audited:
+        header += ' %10s %10s' % ('peak_mb', 'kept_mb')
+    lines = [header + '  rows']
+    for s in stats:
+        line = '%-14s %-22s %9.4f %9.4f' % (s.pipeline, s.stage, s.wall, s.cpu)
+        if audited and s.memory is None:
+            line += ' %10s %10s' % ('-', '-')
+        elif audited:
+            line += ' %10.2f %10.2f' % (s.memory['peak_bytes'] / 2**20, s.memory['retained_bytes'] / 2**20)
+        rows = ', '.join('%s=%d' % item for item in s.rows.items())
+        lines.append(line + '  ' + rows)
+        if s.memory is not None:
+            for copy in s.memory['unmutated_copies']:
+                lines.append('    unmutated copy: %s of %s (%.2f MB)' % (copy['key'], copy['source'], copy['bytes'] / 2**20))
+    totals = {}
+    for s in stats:
+        wall, cpu = totals.get(s.pipeline, (0.0, 0.0))
+        totals[s.pipeline] = (wall + s.wall, cpu + s.cpu)
+    for pipeline, (wall, cpu) in totals.items():
+        lines.append('%-14s %-22s %9.4f %9.4f' % (pipeline, 'TOTAL', wall, cpu))
+    return '\n'.join(lines)
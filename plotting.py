@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Lazy matplotlib access for the analysis modules.
+# Importing matplotlib.pyplot (backend probing, font cache) costs more than the rest of a
+# small run put together, so nothing imports it at module level: plotting code calls
+# pyplot() when it actually draws. In batch mode the Agg backend is picked before
+# matplotlib loads, so no GUI toolkit is ever probed or imported.
+
+import os
+import sys
+
+
+BATCH_ENV = 'GUIDED_PROJECTS_BATCH'
+
+
+def is_batch():
+    #Explicit flag first, then: a notebook kernel is never batch, a Linux box
+    #without a display always is
+    flag = os.environ.get(BATCH_ENV, '').lower()
+    if flag in ('1', 'true', 'yes'):
+        return True
+    if flag in ('0', 'false', 'no'):
+        return False
+    if 'ipykernel' in sys.modules:
+        return False
+    return sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+
+def select_backend(force=False):
+    """Use Agg in batch mode, unless the user picked a backend with MPLBACKEND.
+
+    `force` always picks Agg, even over MPLBACKEND (e.g. in export workers).
+    """
+    if not force and (os.environ.get('MPLBACKEND') or not is_batch()):
+        return
+    matplotlib = sys.modules.get('matplotlib')
+    if matplotlib is None:
+        os.environ['MPLBACKEND'] = 'Agg'
+    else:
+        matplotlib.use('Agg')
+
+
+def pyplot():
+    select_backend()
+    import matplotlib.pyplot as plt
+    return plt
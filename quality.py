@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Declarative data-quality rules, checked as boolean masks.
+# The notebooks sanity check years and prices by printing value_counts().sort_index() and
+# reading the output. Here each check is a Rule; check() turns every column a rule set needs
+# into a NumPy array once, evaluates all rules as vectorized masks on those arrays, and gets
+# every rule's violation count from a single reduction over the stacked masks.
+#
+#   rules = [in_range('price', 1, 351000), compare('cease_date', '>=', 'dete_start_date')]
+#   report = check(autos, rules)
+#   report.summary; report.samples['price in [1, 351000]']
+
+import operator
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+Rule = namedtuple('Rule', ['name', 'columns', 'violations'])
+QualityReport = namedtuple('QualityReport', ['summary', 'samples', 'mask'])
+
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+             '==': operator.eq, '!=': operator.ne}
+
+
+def in_range(column, low=None, high=None, name=None):
+    """Values outside [low, high], or present but not a number.
+
+    Missing values are not violations, use not_null for those.
+    """
+    def violations(cols):
+        values = cols.numeric(column)
+        bad = cols.unparseable(column).copy()
+        if low is not None:
+            bad |= values < low
+        if high is not None:
+            bad |= values > high
+        return bad
+    return Rule(name or '%s in [%s, %s]' % (column, low, high), (column,), violations)
+
+
+def allowed(column, values, name=None):
+    """Values not in the allowed set (missing values pass)."""
+    values = list(values)
+
+    def violations(cols):
+        raw = cols.raw(column)
+        return ~pd.isna(raw) & ~np.isin(raw, np.asarray(values, dtype=object))
+    return Rule(name or '%s in allowed set' % column, (column,), violations)
+
+
+def not_null(column, name=None):
+    return Rule(name or '%s not null' % column, (column,), lambda cols: pd.isna(cols.raw(column)))
+
+
+def compare(left, op, right, name=None):
+    """Cross-column rule `left op right`, where right is a column name or a number.
+
+    Rows where either side is missing are not checked; a side that is present
+    but not a number is a violation.
+    """
+    compare_op = OPERATORS[op]
+
+    def violations(cols):
+        a = cols.numeric(left)
+        b = cols.numeric(right) if isinstance(right, str) else right
+        with np.errstate(invalid='ignore'):
+            bad = ~compare_op(a, b) & ~np.isnan(a) & ~np.isnan(b)
+        bad |= cols.unparseable(left)
+        if isinstance(right, str):
+            bad |= cols.unparseable(right)
+        return bad
+    columns = (left, right) if isinstance(right, str) else (left,)
+    return Rule(name or '%s %s %s' % (left, op, right), columns, violations)
+
+
+class _Columns:
+    #Each column is pulled out of the frame (and converted to float) at most
+    #once per check(), however many rules look at it
+
+    def __init__(self, df, derive):
+        self.df = df
+        self.derive = derive or {}
+        self._raw = {}
+        self._numeric = {}
+
+    def raw(self, column):
+        if column not in self._raw:
+            if column in self.derive:
+                values = self.derive[column](self.df)
+            else:
+                values = self.df[column]
+            self._raw[column] = np.asarray(values)
+        return self._raw[column]
+
+    def numeric(self, column):
+        if column not in self._numeric:
+            values = pd.to_numeric(pd.Series(self.raw(column)), errors='coerce')
+            self._numeric[column] = values.to_numpy(dtype=float)
+        return self._numeric[column]
+
+    def unparseable(self, column):
+        #Present in the data but NaN once coerced to a number, e.g. price='abc'
+        return np.isnan(self.numeric(column)) & ~pd.isna(self.raw(column))
+
+
+def check(df, rules, derive=None, sample_size=5):
+    """Evaluate `rules` on `df` and return a QualityReport.
+
+    `derive` maps extra column names to functions of the frame (e.g. the crawl
+    year parsed from date_crawled) that rules can refer to like real columns.
+    `summary` has one row per rule with its violation count, `samples` holds up
+    to `sample_size` offending rows per rule, and `mask` is the full
+    rows x rules violation matrix.
+    """
+    cols = _Columns(df, derive)
+    names = [rule.name for rule in rules]
+    if rules:
+        masks = np.vstack([np.asarray(rule.violations(cols), dtype=bool) for rule in rules])
+    else:
+        masks = np.zeros((0, len(df)), dtype=bool)
+    counts = masks.sum(axis=1)
+
+    summary = pd.DataFrame({
+        'rule': names,
+        'columns': [', '.join(rule.columns) for rule in rules],
+        'violations': counts,
+        'share': counts / max(len(df), 1),
+    })
+    samples = {}
+    for name, row_mask, count in zip(names, masks, counts):
+        if count:
+            positions = np.flatnonzero(row_mask)[:sample_size]
+            samples[name] = df.iloc[positions]
+    mask = pd.DataFrame(masks.T, index=df.index, columns=names)
+    return QualityReport(summary, samples, mask)
+
+
+def crawl_year(column='date_crawled'):
+    #Derived column helper for listing data: the year each ad was crawled
+    return lambda df: pd.to_datetime(df[column], errors='coerce').dt.year
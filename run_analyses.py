@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Command line runner for the four analyses, outside Jupyter.
+#
+#   python run_analyses.py exit-surveys --dete dete_survey.csv --tafe tafe_survey.csv --profile
+#   python run_analyses.py cars --autos autos.csv
+#   python run_analyses.py majors --grads recent-grads.csv --no-plots
+#   python run_analyses.py gender-gap --degrees percent-bachelors-degrees-women-usa.csv
+#   python run_analyses.py all --out results/ --profile
+#
+# Figures go to --out (Agg backend, no display needed) together with the CSV outputs of each
+# analysis. --profile prints wall time, CPU time and row counts for every stage.
+# All input files are read concurrently up front and each analysis starts as soon as its
+# own inputs are loaded.
+# --memory-report PATH also traces memory per stage (tracemalloc peak/retained bytes, frame
+# memory_usage, full-frame copies nothing modified) and writes it as JSON to PATH. With it
+# the analyses only start once every input is loaded, so loads don't show up in stage memory.
+
+import argparse
+import json
+import os
+import sys
+
+from loading import DATASETS, iter_loaded
+from pipeline import StageStats, format_profile, memory_report, run_pipeline
+from plotting import BATCH_ENV
+
+
+#name -> (module, datasets it reads, {state key: output csv name})
+ANALYSES = {
+    'exit-surveys': ('exit_surveys', ['dete_survey', 'tafe_survey'],
+                     {'service_cat_pvtable': 'service_cat_dissatisfaction.csv',
+                      'quality_summary': 'exit_survey_quality.csv'}),
+    'cars': ('car_listings', ['autos'],
+             {'sorted_cars_df': 'brand_price_mileage.csv',
+              'quality_summary': 'autos_quality.csv'}),
+    'majors': ('college_majors', ['recent_grads'],
+               {'correlations': 'major_correlations.csv'}),
+    'gender-gap': ('gender_gap', ['women_degrees'],
+                   {'shares': 'degree_shares.csv'}),
+}
+
+#dataset -> command line option for its path
+INPUT_OPTIONS = {
+    'dete_survey': 'dete',
+    'tafe_survey': 'tafe',
+    'autos': 'autos',
+    'recent_grads': 'grads',
+    'women_degrees': 'degrees',
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Run the guided-project analyses as batch jobs.')
+    parser.add_argument('analysis', choices=sorted(ANALYSES) + ['all'])
+    for dataset, option in INPUT_OPTIONS.items():
+        parser.add_argument('--' + option, default=DATASETS[dataset][0], help='input csv (default: %(default)s)')
+    parser.add_argument('--out', default='.', help='directory for figures and csv outputs')
+    parser.add_argument('--store', metavar='DIR', help='also write cleaned listings/surveys to a partitioned Parquet store')
+    parser.add_argument('--no-plots', action='store_true', help='skip the plotting stages')
+    parser.add_argument('--profile', action='store_true', help='print per-stage timing and row counts')
+    parser.add_argument('--memory-report', metavar='PATH', help='trace memory per stage and write a JSON report')
+    return parser
+
+
+def run_analysis(name, args, frames):
+    import importlib
+
+    module_name, datasets, outputs = ANALYSES[name]
+    module = importlib.import_module(module_name)
+    state = {dataset: frames[dataset] for dataset in datasets}
+    #Input paths too (grads_path, ...), for stages that read more than the preloaded frame
+    state.update({INPUT_OPTIONS[dataset] + '_path': getattr(args, INPUT_OPTIONS[dataset])
+                  for dataset in datasets})
+    state.update(out_dir=args.out, plots=not args.no_plots, store_dir=args.store)
+    state, stats = run_pipeline(name, module.STAGES, state, audit_memory=bool(args.memory_report))
+    for key, filename in outputs.items():
+        state[key].to_csv(os.path.join(args.out, filename))
+    return state, stats
+
+
+def load_options(names):
+    #read_csv options the analyses ask for on their preloaded inputs (e.g. usecols)
+    import importlib
+
+    options = {}
+    for name in names:
+        options.update(getattr(importlib.import_module(ANALYSES[name][0]), 'LOAD_OPTIONS', {}))
+    return options
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    #Batch runs never have a display, plotting.select_backend picks Agg from this
+    os.environ.setdefault(BATCH_ENV, '1')
+    os.makedirs(args.out, exist_ok=True)
+
+    names = sorted(ANALYSES) if args.analysis == 'all' else [args.analysis]
+    needed = list(dict.fromkeys(dataset for name in names for dataset in ANALYSES[name][1]))
+    paths = {dataset: getattr(args, INPUT_OPTIONS[dataset]) for dataset in needed}
+
+    #All inputs are read concurrently; each analysis starts as soon as its own
+    #inputs are in, while the remaining files keep loading in the background.
+    #tracemalloc counts every thread, so with --memory-report all loads finish
+    #first and the stage numbers don't include other files being parsed
+    frames = {}
+    all_stats = []
+    loads = iter_loaded(needed, paths, options=load_options(names))
+    if args.memory_report:
+        loads = list(loads)
+    for loaded in loads:
+        frames[loaded.name] = loaded.frame
+        all_stats.append(StageStats('load', loaded.name, loaded.wall, loaded.cpu,
+                                    {loaded.name: len(loaded.frame)}))
+        for name in [n for n in names if all(d in frames for d in ANALYSES[n][1])]:
+            names.remove(name)
+            state, stats = run_analysis(name, args, frames)
+            all_stats.extend(stats)
+            for path in state.get('figures', []):
+                print('%s: wrote %s' % (name, path))
+    if args.profile:
+        print(format_profile(all_stats), file=sys.stderr)
+    if args.memory_report:
+        with open(args.memory_report, 'w') as f:
+            json.dump(memory_report(all_stats), f, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())